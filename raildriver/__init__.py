@@ -1,5 +1,5 @@
 from raildriver.library import *
-from raildriver import events
+from raildriver import backends, events
 
 
 VERSION = (1, 1, 5)
@@ -0,0 +1,266 @@
+import os
+
+import six
+
+
+class Backend(object):
+    """
+    Interface every RailDriver backend has to implement.
+
+    Backends deal with controller indexes only, name lookups are done by raildriver.RailDriver.
+    """
+
+    def get_controller_list(self):
+        """
+        Returns a list of controller names, ordered by their index.
+
+        :return list
+        """
+        raise NotImplementedError
+
+    def get_controller_value(self, index, value_type):
+        """
+        Returns current/min/max value of controller at given index.
+
+        :param index integer index
+        :param value_type one of VALUE_CURRENT, VALUE_MIN, VALUE_MAX
+        :return float
+        """
+        raise NotImplementedError
+
+    def get_loco_name(self):
+        """
+        Returns raw '.:.' separated loco name or empty string if not ready.
+
+        :return str
+        """
+        raise NotImplementedError
+
+    def set_controller_value(self, index, value):
+        """
+        Sets current value of controller at given index.
+
+        :param index integer index
+        :param value float
+        """
+        raise NotImplementedError
+
+    def set_rail_driver_connected(self, value):
+        """
+        Starts or stops exchanging data with Train Simulator.
+
+        :param value bool
+        """
+        raise NotImplementedError
+
+
+class DllBackend(Backend):
+    """
+    Talks to the real raildriver.dll shipped with Train Simulator.
+
+    Registry lookup and loading of the library only happen when this backend is instantiated,
+    so importing raildriver works fine on non-Windows machines.
+    """
+
+    dll = None
+
+    def __init__(self, dll_location=None, dll=None):
+        """
+        :param dll_location Optionally pass the location of raildriver.dll if in some custom location.
+                            If not passed will try to guess the location by using the Windows Registry.
+        :param dll Optionally pass an already loaded raildriver.dll, dll_location is ignored then.
+        """
+        if dll is None:
+            import ctypes
+
+            if not dll_location:
+                dll_location = self.find_dll_location()
+            dll = ctypes.cdll.LoadLibrary(dll_location)
+        self.bind(dll)
+
+    def __repr__(self):
+        return 'raildriver.backends.DllBackend: {}'.format(self.dll)
+
+    def bind(self, dll):
+        """
+        Starts using given raildriver.dll, declaring types of its functions.
+
+        :param dll loaded raildriver.dll
+        """
+        import ctypes
+
+        # GetControllerValue is left without argtypes, plain ints are converted natively and
+        # going through c_int.from_param only makes the call slower
+        argtypes = {
+            'SetControllerValue': [ctypes.c_int, ctypes.c_float],
+            'SetRailDriverConnected': [ctypes.c_bool],
+        }
+        restypes = {
+            'GetControllerList': ctypes.c_char_p,
+            'GetLocoName': ctypes.c_char_p,
+            'GetControllerValue': ctypes.c_float,
+        }
+
+        self.dll = dll
+        for function_name, function_argtypes in argtypes.items():
+            getattr(self.dll, function_name).argtypes = function_argtypes
+        for function_name, restype in restypes.items():
+            getattr(self.dll, function_name).restype = restype
+        # polled on every Listener iteration, skip the Python passthrough
+        self.get_controller_value = self.dll.GetControllerValue
+
+    @staticmethod
+    def find_dll_location():
+        """
+        Guesses the location of raildriver.dll by using the Windows Registry.
+
+        :raises EnvironmentError if raildriver.dll cannot be found
+        :return str
+        """
+        try:
+            import winreg
+        except ImportError:
+            import _winreg as winreg
+
+        steam_key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, 'Software\\Valve\\Steam')
+        steam_path = winreg.QueryValueEx(steam_key, 'SteamPath')[0]
+        railworks_path = os.path.join(steam_path, 'steamApps', 'common', 'railworks', 'plugins')
+        dll_location = os.path.join(railworks_path, 'raildriver.dll')
+        if not os.path.isfile(dll_location):
+            raise EnvironmentError('Unable to automatically locate raildriver.dll.')
+        return dll_location
+
+    def get_controller_list(self):
+        ret_str = self.dll.GetControllerList().decode()
+        if not ret_str:
+            return []
+        return ret_str.split('::')
+
+    def get_loco_name(self):
+        return self.dll.GetLocoName().decode()
+
+    def set_controller_value(self, index, value):
+        self.dll.SetControllerValue(index, value)
+
+    def set_rail_driver_connected(self, value):
+        self.dll.SetRailDriverConnected(value)
+
+
+class FakeBackend(Backend):
+    """
+    In-process backend keeping all the state in memory. Useful for testing and analysis
+    on machines without Train Simulator.
+    """
+
+    connected = False
+    controllers = None
+    loco_name = None
+    values = None
+
+    def __init__(self, controllers=None, loco_name='', values=None):
+        """
+        :param controllers list of controller names, ordered by their index
+        :param loco_name '.:.' separated Provider, Product and Engine name
+        :param values dict of {index: [current, min, max]}, missing indexes read as 0.0
+        """
+        self._load_state(controllers, loco_name, values)
+
+    def __repr__(self):
+        return 'raildriver.backends.FakeBackend: {}'.format(self.loco_name)
+
+    def _load_state(self, controllers=None, loco_name='', values=None):
+        self.controllers = list(controllers or [])
+        self.loco_name = loco_name
+        self.values = {}
+        for index, value in (values or {}).items():
+            self.values[int(index)] = [float(v) for v in value]
+
+    def get_controller_list(self):
+        return list(self.controllers)
+
+    def get_controller_value(self, index, value_type):
+        return self.values.get(index, [0.0, 0.0, 0.0])[value_type]
+
+    def get_loco_name(self):
+        return self.loco_name
+
+    def set_controller_value(self, index, value):
+        self.values.setdefault(index, [0.0, 0.0, 0.0])[0] = float(value)
+
+    def set_rail_driver_connected(self, value):
+        self.connected = bool(value)
+
+
+class ReplayBackend(FakeBackend):
+    """
+    Replays frames previously saved to a JSON file. The file has to contain a list of frames, each of them
+    being a dict of FakeBackend keyword arguments, ie.:
+
+    [{"controllers": ["Reverser", "Regulator"], "loco_name": "DTG.:.Class105Pack01.:.Class 105 DMBS",
+      "values": {"0": [1.0, -1.0, 1.0], "1": [0.5, 0.0, 1.0]}}]
+    """
+
+    frame = 0
+    frames = None
+
+    def __init__(self, replay_location):
+        """
+        :param replay_location path to the JSON file containing frames
+        """
+        import json
+
+        # state is loaded frame by frame in seek()
+        super(ReplayBackend, self).__init__()
+        with open(replay_location) as replay_file:
+            self.frames = json.load(replay_file)
+        if not self.frames:
+            raise ValueError('Replay file {} contains no frames'.format(replay_location))
+        self.seek(0)
+
+    def __repr__(self):
+        return 'raildriver.backends.ReplayBackend: frame {} of {}'.format(self.frame, len(self.frames))
+
+    def advance(self):
+        """
+        Moves to the next frame.
+
+        :return bool False if there are no more frames to replay
+        """
+        if self.frame + 1 >= len(self.frames):
+            return False
+        self.seek(self.frame + 1)
+        return True
+
+    def seek(self, frame):
+        """
+        Moves to given frame. Values set with set_controller_value are replaced by the ones recorded in the frame.
+
+        :param frame integer index of frame
+        :raises ValueError if there is no such frame
+        """
+        if isinstance(frame, bool) or not isinstance(frame, six.integer_types) or not 0 <= frame < len(self.frames):
+            raise ValueError('Frame {} out of range, replay contains {} frames'.format(frame, len(self.frames)))
+        self._load_state(**self.frames[frame])
+        self.frame = frame
+
+
+BACKENDS = {
+    'dll': DllBackend,
+    'fake': FakeBackend,
+    'replay': ReplayBackend,
+}
+
+
+def load_backend(name, *args, **kwargs):
+    """
+    Instantiates backend registered under given name.
+
+    :param name one of BACKENDS keys
+    :raises ValueError if there is no such backend
+    :return Backend
+    """
+    try:
+        backend_class = BACKENDS[name]
+    except KeyError:
+        raise ValueError('Unknown backend {}'.format(name))
+    return backend_class(*args, **kwargs)
@@ -1,8 +1,6 @@
-import ctypes
 import datetime
-import os
 
-from six.moves import winreg
+from raildriver import backends
 
 
 VALUE_CURRENT = 0
@@ -12,34 +10,34 @@ VALUE_MAX = 2
 
 class RailDriver(object):
 
-    dll = None
+    backend = None
 
-    _restypes = {
-        'GetControllerList': ctypes.c_char_p,
-        'GetLocoName': ctypes.c_char_p,
-        'GetControllerValue': ctypes.c_float,
-    }
-
-    def __init__(self, dll_location=None):
+    def __init__(self, dll_location=None, backend=None):
         """
         Initializes the raildriver.dll interface.
 
         :param dll_location Optionally pass the location of raildriver.dll if in some custom location.
                             If not passed will try to guess the location by using the Windows Registry.
+        :param backend Optionally pass a raildriver.backends.Backend instance to use instead of raildriver.dll,
+                       see raildriver.backends.load_backend.
+        :raises ValueError if both dll_location and backend are passed
         """
-        if not dll_location:
-            steam_key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, 'Software\\Valve\\Steam')
-            steam_path = winreg.QueryValueEx(steam_key, 'SteamPath')[0]
-            railworks_path = os.path.join(steam_path, 'steamApps', 'common', 'railworks', 'plugins')
-            dll_location = os.path.join(railworks_path, 'raildriver.dll')
-            if not os.path.isfile(dll_location):
-                raise EnvironmentError('Unable to automatically locate raildriver.dll.')
-        self.dll = ctypes.cdll.LoadLibrary(dll_location)
-        for function_name, restype in self._restypes.items():
-            getattr(self.dll, function_name).restype = restype
+        if dll_location and backend is not None:
+            raise ValueError('Pass either dll_location or backend, not both.')
+        if backend is None:
+            backend = backends.DllBackend(dll_location)
+        self.backend = backend
 
     def __repr__(self):
-        return 'raildriver.RailDriver: {}'.format(self.dll)
+        return 'raildriver.RailDriver: {}'.format(self.backend)
+
+    @property
+    def dll(self):
+        return getattr(self.backend, 'dll', None)
+
+    @dll.setter
+    def dll(self, dll):
+        self.backend = backends.DllBackend(dll=dll)
 
     def get_controller_index(self, name):
         for idx, n in self.get_controller_list():
@@ -59,10 +57,10 @@ class RailDriver(object):
 
         :return enumerate
         """
-        ret_str = self.dll.GetControllerList().decode()
-        if not ret_str:
+        controllers = self.backend.get_controller_list()
+        if not controllers:
             return []
-        return enumerate(ret_str.split('::'))
+        return enumerate(controllers)
 
     def get_controller_value(self, index_or_name, value_type):
         """
@@ -80,7 +78,7 @@ class RailDriver(object):
             index = self.get_controller_index(index_or_name)
         else:
             index = index_or_name
-        return self.dll.GetControllerValue(index, value_type)
+        return self.backend.get_controller_value(index, value_type)
 
     def get_current_controller_value(self, index_or_name):
         """
@@ -146,7 +144,7 @@ class RailDriver(object):
 
         :return list
         """
-        ret_str = self.dll.GetLocoName().decode()
+        ret_str = self.backend.get_loco_name()
         if not ret_str:
             return
         return ret_str.split('.:.')
@@ -180,7 +178,7 @@ class RailDriver(object):
             index = self.get_controller_index(index_or_name)
         else:
             index = index_or_name
-        self.dll.SetControllerValue(index, ctypes.c_float(value))
+        self.backend.set_controller_value(index, value)
 
     def set_rail_driver_connected(self, value):
         """
@@ -188,4 +186,4 @@ class RailDriver(object):
 
         :param bool True to start exchanging data, False to stop
         """
-        self.dll.SetRailDriverConnected(True)
+        self.backend.set_rail_driver_connected(value)
@@ -1,5 +1,9 @@
 import ctypes
 import datetime
+import json
+import os
+import subprocess
+import tempfile
 import unittest
 import time
 import sys
@@ -24,6 +28,77 @@ class AbstractRaildriverDllTestCase(unittest.TestCase):
             self.mock_dll = mock_dll.return_value
 
 
+class FakeBackendTestCase(unittest.TestCase):
+
+    raildriver = None
+
+    def setUp(self):
+        backend = raildriver.backends.FakeBackend(['Reverser', 'Regulator'], 'DTG.:.Class105Pack01.:.Class 105 DMBS',
+                                                  {'1': [0.5, 0.0, 1.0]})
+        self.raildriver = raildriver.RailDriver(backend=backend)
+
+    def test_get_controller_list(self):
+        self.assertEqual(list(self.raildriver.get_controller_list()), [(0, 'Reverser'), (1, 'Regulator')])
+
+    def test_get_controller_value(self):
+        self.assertEqual(self.raildriver.get_current_controller_value('Regulator'), 0.5)
+        self.assertEqual(self.raildriver.get_max_controller_value('Regulator'), 1.0)
+        self.assertEqual(self.raildriver.get_current_controller_value('Reverser'), 0.0)
+
+    def test_get_loco_name(self):
+        self.assertEqual(self.raildriver.get_loco_name(), ['DTG', 'Class105Pack01', 'Class 105 DMBS'])
+
+    def test_set_controller_value(self):
+        self.raildriver.set_controller_value('Reverser', 1.0)
+        self.assertEqual(self.raildriver.get_current_controller_value(0), 1.0)
+
+    def test_set_rail_driver_connected(self):
+        self.raildriver.set_rail_driver_connected(True)
+        self.assertTrue(self.raildriver.backend.connected)
+
+
+class LoadBackendTestCase(unittest.TestCase):
+
+    def test_loads_by_name(self):
+        self.assertIsInstance(raildriver.backends.load_backend('fake'), raildriver.backends.FakeBackend)
+
+    def test_unknown_name(self):
+        self.assertRaises(ValueError, raildriver.backends.load_backend, 'serial')
+
+
+class ReplayBackendTestCase(unittest.TestCase):
+
+    backend = None
+
+    def setUp(self):
+        frames = [
+            {'controllers': ['Reverser'], 'loco_name': 'DTG.:.Class105Pack01.:.Class 105 DMBS',
+             'values': {'0': [0.0, -1.0, 1.0]}},
+            {'controllers': ['Reverser'], 'loco_name': 'DTG.:.Class105Pack01.:.Class 105 DMBS',
+             'values': {'0': [1.0, -1.0, 1.0]}},
+        ]
+        fd, replay_location = tempfile.mkstemp(suffix='.json')
+        with os.fdopen(fd, 'w') as replay_file:
+            json.dump(frames, replay_file)
+        self.addCleanup(os.remove, replay_location)
+        self.backend = raildriver.backends.ReplayBackend(replay_location)
+
+    def test_seek_out_of_range(self):
+        self.assertRaises(ValueError, self.backend.seek, -1)
+        self.assertRaises(ValueError, self.backend.seek, 2)
+        self.assertRaises(ValueError, self.backend.seek, 1.0)
+        self.assertRaises(ValueError, self.backend.seek, True)
+        self.assertEqual(self.backend.frame, 0)
+
+    def test_advance(self):
+        rd = raildriver.RailDriver(backend=self.backend)
+        self.assertEqual(rd.get_current_controller_value('Reverser'), 0.0)
+        self.assertTrue(self.backend.advance())
+        self.assertEqual(rd.get_current_controller_value('Reverser'), 1.0)
+        self.assertFalse(self.backend.advance())
+        self.assertEqual(self.backend.frame, 1)
+
+
 class ListenerTestCase(AbstractRaildriverDllTestCase):
 
     listener = None
@@ -133,19 +208,19 @@ class RailDriverGetControllerListTestCase(AbstractRaildriverDllTestCase):
 class RailDriverGetControllerValueTestCase(AbstractRaildriverDllTestCase):
 
     def test_get_by_index(self):
-        with mock.patch.object(self.mock_dll, 'GetControllerValue', return_value=0.5) as mock_gcv:
+        with mock.patch.object(self.raildriver.backend, 'get_controller_value', return_value=0.5) as mock_gcv:
             self.assertEqual(self.raildriver.get_controller_value(1, raildriver.VALUE_CURRENT), 0.5)
             mock_gcv.assert_called_with(1, 0)
 
     def test_get_by_name_exists(self):
-        with mock.patch.object(self.mock_dll, 'GetControllerValue', return_value=0.5) as mock_gcv:
+        with mock.patch.object(self.raildriver.backend, 'get_controller_value', return_value=0.5) as mock_gcv:
             with mock.patch.object(self.mock_dll, 'GetControllerList',
                                    return_value=six.b('Active::Throttle::Brake::Reverser')):
                 self.assertEqual(self.raildriver.get_controller_value('Throttle', raildriver.VALUE_CURRENT), 0.5)
                 mock_gcv.assert_called_with(1, 0)
 
     def test_get_by_name_does_not_exist(self):
-        with mock.patch.object(self.mock_dll, 'GetControllerValue', return_value=0.5) as mock_gcv:
+        with mock.patch.object(self.raildriver.backend, 'get_controller_value', return_value=0.5) as mock_gcv:
             with mock.patch.object(self.mock_dll, 'GetControllerList',
                                    return_value=six.b('Active::Throttle::Brake::Reverser')):
                 self.assertRaises(ValueError, self.raildriver.get_controller_value,
@@ -155,12 +230,12 @@ class RailDriverGetControllerValueTestCase(AbstractRaildriverDllTestCase):
 class RailDriverGetCurrentControllerValue(AbstractRaildriverDllTestCase):
 
     def test_get_by_index(self):
-        with mock.patch.object(self.mock_dll, 'GetControllerValue', return_value=0.5) as mock_gcv:
+        with mock.patch.object(self.raildriver.backend, 'get_controller_value', return_value=0.5) as mock_gcv:
             self.assertEqual(self.raildriver.get_current_controller_value(1), 0.5)
             mock_gcv.assert_called_with(1, 0)
 
     def test_get_by_name(self):
-        with mock.patch.object(self.mock_dll, 'GetControllerValue', return_value=0.5) as mock_gcv:
+        with mock.patch.object(self.raildriver.backend, 'get_controller_value', return_value=0.5) as mock_gcv:
             with mock.patch.object(self.mock_dll, 'GetControllerList',
                                    return_value=six.b('Active::Throttle::Brake::Reverser')):
                 self.assertEqual(self.raildriver.get_current_controller_value('Throttle'), 0.5)
@@ -170,7 +245,7 @@ class RailDriverGetCurrentControllerValue(AbstractRaildriverDllTestCase):
 class RailDriverGetCurrentCoordinates(AbstractRaildriverDllTestCase):
 
     def test_get(self):
-        with mock.patch.object(self.mock_dll, 'GetControllerValue', side_effect=[51.50, -0.13]) as mock_gcv:
+        with mock.patch.object(self.raildriver.backend, 'get_controller_value', side_effect=[51.50, -0.13]) as mock_gcv:
             self.assertEqual(self.raildriver.get_current_coordinates(), (51.50, -0.13))
             mock_gcv.assert_any_call(400, 0)
             mock_gcv.assert_any_call(401, 0)
@@ -179,7 +254,7 @@ class RailDriverGetCurrentCoordinates(AbstractRaildriverDllTestCase):
 class RailDriverGetCurrentFuelLevelTestCase(AbstractRaildriverDllTestCase):
 
     def test_get(self):
-        with mock.patch.object(self.mock_dll, 'GetControllerValue', return_value=100) as mock_gcv:
+        with mock.patch.object(self.raildriver.backend, 'get_controller_value', return_value=100) as mock_gcv:
             self.assertEqual(self.raildriver.get_current_fuel_level(), 100)
             mock_gcv.assert_called_with(402, 0)
 
@@ -187,7 +262,7 @@ class RailDriverGetCurrentFuelLevelTestCase(AbstractRaildriverDllTestCase):
 class RailDriverGetCurrentIsInTunnelLevelTestCase(AbstractRaildriverDllTestCase):
 
     def test_get(self):
-        with mock.patch.object(self.mock_dll, 'GetControllerValue', return_value=1.0) as mock_gcv:
+        with mock.patch.object(self.raildriver.backend, 'get_controller_value', return_value=1.0) as mock_gcv:
             self.assertTrue(self.raildriver.get_current_is_in_tunnel())
             mock_gcv.assert_called_with(403, 0)
 
@@ -195,7 +270,7 @@ class RailDriverGetCurrentIsInTunnelLevelTestCase(AbstractRaildriverDllTestCase)
 class RailDriverGetCurrentGradientTestCase(AbstractRaildriverDllTestCase):
 
     def test_get(self):
-        with mock.patch.object(self.mock_dll, 'GetControllerValue', return_value=0.1) as mock_gcv:
+        with mock.patch.object(self.raildriver.backend, 'get_controller_value', return_value=0.1) as mock_gcv:
             self.assertEqual(self.raildriver.get_current_gradient(), 0.1)
             mock_gcv.assert_called_with(404, 0)
 
@@ -203,7 +278,7 @@ class RailDriverGetCurrentGradientTestCase(AbstractRaildriverDllTestCase):
 class RailDriverGetCurrentHeadingTestCase(AbstractRaildriverDllTestCase):
 
     def test_get(self):
-        with mock.patch.object(self.mock_dll, 'GetControllerValue', return_value=0.1) as mock_gcv:
+        with mock.patch.object(self.raildriver.backend, 'get_controller_value', return_value=0.1) as mock_gcv:
             self.assertEqual(self.raildriver.get_current_heading(), 0.1)
             mock_gcv.assert_called_with(405, 0)
 
@@ -211,7 +286,7 @@ class RailDriverGetCurrentHeadingTestCase(AbstractRaildriverDllTestCase):
 class RailDriverGetCurrentTime(AbstractRaildriverDllTestCase):
 
     def test_get(self):
-        with mock.patch.object(self.mock_dll, 'GetControllerValue', side_effect=[12, 30, 0]) as mock_gcv:
+        with mock.patch.object(self.raildriver.backend, 'get_controller_value', side_effect=[12, 30, 0]) as mock_gcv:
             self.assertEqual(self.raildriver.get_current_time(), datetime.time(12, 30, 0))
             mock_gcv.assert_any_call(406, 0)
             mock_gcv.assert_any_call(407, 0)
@@ -233,12 +308,12 @@ class RailDriverGetLocoNameTestCase(AbstractRaildriverDllTestCase):
 class RailDriverGetMaxControllerValueTestCase(AbstractRaildriverDllTestCase):
 
     def test_get_by_index(self):
-        with mock.patch.object(self.mock_dll, 'GetControllerValue', return_value=0.5) as mock_gcv:
+        with mock.patch.object(self.raildriver.backend, 'get_controller_value', return_value=0.5) as mock_gcv:
             self.assertEqual(self.raildriver.get_max_controller_value(1), 0.5)
             mock_gcv.assert_called_with(1, 2)
 
     def test_get_by_name(self):
-        with mock.patch.object(self.mock_dll, 'GetControllerValue', return_value=0.5) as mock_gcv:
+        with mock.patch.object(self.raildriver.backend, 'get_controller_value', return_value=0.5) as mock_gcv:
             with mock.patch.object(self.mock_dll, 'GetControllerList',
                                    return_value=six.b('Active::Throttle::Brake::Reverser')):
                 self.assertEqual(self.raildriver.get_max_controller_value('Throttle'), 0.5)
@@ -248,12 +323,12 @@ class RailDriverGetMaxControllerValueTestCase(AbstractRaildriverDllTestCase):
 class RailDriverGetMinControllerValueTestCase(AbstractRaildriverDllTestCase):
 
     def test_get_by_index(self):
-        with mock.patch.object(self.mock_dll, 'GetControllerValue', return_value=0.5) as mock_gcv:
+        with mock.patch.object(self.raildriver.backend, 'get_controller_value', return_value=0.5) as mock_gcv:
             self.assertEqual(self.raildriver.get_min_controller_value(1), 0.5)
             mock_gcv.assert_called_with(1, 1)
 
     def test_get_by_name(self):
-        with mock.patch.object(self.mock_dll, 'GetControllerValue', return_value=0.5) as mock_gcv:
+        with mock.patch.object(self.raildriver.backend, 'get_controller_value', return_value=0.5) as mock_gcv:
             with mock.patch.object(self.mock_dll, 'GetControllerList',
                                    return_value=six.b('Active::Throttle::Brake::Reverser')):
                 self.assertEqual(self.raildriver.get_min_controller_value('Throttle'), 0.5)
@@ -263,17 +338,54 @@ class RailDriverGetMinControllerValueTestCase(AbstractRaildriverDllTestCase):
 @mock.patch('ctypes.cdll.LoadLibrary')
 class RailDriverInitTestCase(unittest.TestCase):
 
-    @mock.patch('{}.OpenKey'.format(WINREG_MODULE), mock.Mock())
-    @mock.patch('{}.QueryValueEx'.format(WINREG_MODULE), mock.Mock(return_value=['C:\\Steam']))
     @mock.patch('os.path.isfile', mock.Mock(return_value=True))
     def test_if_location_not_specified_checks_registry(self, load_library):
-        raildriver.RailDriver()
-        load_library.assert_called_with('C:\\Steam\\steamApps\\common\\railworks\\plugins\\raildriver.dll')
+        mock_winreg = mock.Mock()
+        mock_winreg.QueryValueEx.return_value = ['C:\\Steam']
+        with mock.patch.dict(sys.modules, {WINREG_MODULE: mock_winreg}):
+            raildriver.RailDriver()
+        load_library.assert_called_with(
+            os.path.join('C:\\Steam', 'steamApps', 'common', 'railworks', 'plugins', 'raildriver.dll'))
 
     def test_if_location_specified_uses_that(self, load_library):
         raildriver.RailDriver('C:\\Railworks\\raildriver.dll')
         load_library.assert_called_with('C:\\Railworks\\raildriver.dll')
 
+    def test_prebinds_argtypes(self, load_library):
+        raildriver.RailDriver('C:\\Railworks\\raildriver.dll')
+        self.assertEqual(load_library.return_value.SetControllerValue.argtypes, [ctypes.c_int, ctypes.c_float])
+        self.assertEqual(load_library.return_value.SetRailDriverConnected.argtypes, [ctypes.c_bool])
+
+    def test_binds_get_controller_value_directly(self, load_library):
+        rd = raildriver.RailDriver('C:\\Railworks\\raildriver.dll')
+        self.assertIs(rd.backend.get_controller_value, load_library.return_value.GetControllerValue)
+
+    def test_if_backend_specified_does_not_load_dll(self, load_library):
+        raildriver.RailDriver(backend=raildriver.backends.FakeBackend())
+        self.assertFalse(load_library.called)
+
+    def test_dll_can_be_assigned(self, load_library):
+        rd = raildriver.RailDriver(backend=raildriver.backends.FakeBackend())
+        dll = mock.Mock()
+        rd.dll = dll
+        self.assertIs(rd.dll, dll)
+        self.assertIs(rd.backend.get_controller_value, dll.GetControllerValue)
+        self.assertFalse(load_library.called)
+
+    def test_location_and_backend_are_exclusive(self, load_library):
+        self.assertRaises(ValueError, raildriver.RailDriver, 'C:\\Railworks\\raildriver.dll',
+                          raildriver.backends.FakeBackend())
+
+
+class RailDriverImportTestCase(unittest.TestCase):
+
+    def test_import_is_lazy(self):
+        code = ('import sys; before = set(sys.modules); import raildriver; '
+                'print(sorted(set(sys.modules) - before))')
+        imported = subprocess.check_output([sys.executable, '-c', code], cwd=os.path.dirname(os.path.abspath(__file__)))
+        for module_name in (WINREG_MODULE, 'ctypes', 'json'):
+            self.assertNotIn("'{}'".format(module_name), imported.decode())
+
 
 class RailDriverSetControllerValue(AbstractRaildriverDllTestCase):
 
@@ -283,8 +395,7 @@ class RailDriverSetControllerValue(AbstractRaildriverDllTestCase):
             mock_calls = mock_scv.mock_calls
             self.assertEqual(len(mock_calls), 1)
             self.assertEqual(mock_calls[0][1][0], 1)
-            self.assertIsInstance(mock_calls[0][1][1], ctypes.c_float)
-            self.assertEqual(mock_calls[0][1][1].value, 0.5)
+            self.assertEqual(mock_calls[0][1][1], 0.5)
 
     def test_set_by_name(self):
         with mock.patch.object(self.mock_dll, 'SetControllerValue') as mock_scv:
@@ -294,8 +405,7 @@ class RailDriverSetControllerValue(AbstractRaildriverDllTestCase):
                 mock_calls = mock_scv.mock_calls
                 self.assertEqual(len(mock_calls), 1)
                 self.assertEqual(mock_calls[0][1][0], 1)
-                self.assertIsInstance(mock_calls[0][1][1], ctypes.c_float)
-                self.assertEqual(mock_calls[0][1][1].value, 0.5)
+                self.assertEqual(mock_calls[0][1][1], 0.5)
 
 
 class RailDriverSetRailDriverConnected(AbstractRaildriverDllTestCase):
@@ -304,3 +414,5 @@ class RailDriverSetRailDriverConnected(AbstractRaildriverDllTestCase):
         with mock.patch.object(self.mock_dll, 'SetRailDriverConnected') as mock_srdc:
             self.raildriver.set_rail_driver_connected(True)
             mock_srdc.assert_called_with(True)
+            self.raildriver.set_rail_driver_connected(False)
+            mock_srdc.assert_called_with(False)